@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# لاگ تست‌ها در پوشه موقت؛ قبل از import ماژول تنظیم می‌شود
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="divar-tests-"), "test.log"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    """هر تست در پوشه کاری خودش (فایل‌های داده نسبی به پوشه کاری ساخته می‌شوند)"""
+    monkeypatch.chdir(tmp_path)
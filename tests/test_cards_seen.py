@@ -0,0 +1,35 @@
+"""ردیف‌های کارت (حالت CARDS_ONLY) نباید لینک را «دیده‌شده» کنند؛ اسکرپ جزئیات بعدی باید سراغشان برود"""
+import Divar_Scraper as ds
+
+
+def card(token, title="آپارتمان ۱۲۰ متری"):
+    return ds.card_to_row({"href": f"/v/x/{token}", "title": title,
+                           "desc": ["۱۲۰ متر", "۵٬۰۰۰٬۰۰۰٬۰۰۰ تومان"], "bottom": "لحظاتی پیش در مرکز"}, "apartment")
+
+
+def detail(token):
+    row = {col: None for col in ds.FINAL_COLUMNS}
+    row.update({"category": "apartment", "لینک": f"https://divar.ir/v/x/{token}", "عنوان": "آپارتمان",
+                "متراژ": "۹۰", "سال ساخت": "۱۳۹۵", "تعداد اتاق": "۲", "قیمت کل": "۴,۰۰۰,۰۰۰,۰۰۰",
+                "تاریخ ایجاد": ds.get_current_timestamp()})
+    return row
+
+
+def test_card_only_links_still_need_details():
+    links = [f"https://divar.ir/v/x/{t}" for t in ("card1", "card2", "done1")]
+    ds.persist_scraped_rows(ds.RowBuffer([detail("done1")]), [links[2]])
+    ds.persist_card_rows(ds.RowBuffer([card("card1"), card("card2"), card("done1")]))
+
+    assert ds.dedupe_links(links) == links[:2]
+    assert links[:2] == [lk for lk in links if lk not in ds.load_seen_links()]
+
+
+def test_detail_row_after_card_marks_link_seen():
+    link = "https://divar.ir/v/x/later1"
+    ds.persist_card_rows(ds.RowBuffer([card("later1")]))
+    assert ds.dedupe_links([link]) == [link]
+
+    # جزئیات برداشته شد، بدون فایل‌های seen (فقط اکسل)
+    ds.save_to_excel([detail("later1")], ds.OUTPUT_XLSX)
+    assert link in ds.load_existing_links_from_excel(ds.OUTPUT_XLSX)
+    assert ds.dedupe_links([link]) == []
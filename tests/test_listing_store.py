@@ -0,0 +1,49 @@
+"""تست‌های جست‌وجوی ListingStore (API خواندنی)"""
+import pytest
+
+import Divar_Scraper as ds
+
+
+@pytest.fixture
+def store():
+    store = ds.ListingStore("listings.sqlite")
+    rows = []
+    for i, (price, meterage) in enumerate([("3,000,000,000", "90"), ("توافقی", "120"), ("1,500,000,000", "60"),
+                                           ("توافقی", "75"), ("3,000,000,000", "110"), ("2,000,000,000", None)]):
+        rows.append({"لینک": f"https://divar.ir/v/x/t{i}", "عنوان": f"آپارتمان {i}", "قیمت کل": price,
+                     "متراژ": meterage, "تاریخ ایجاد": f"2024-01-0{i + 1} 10:00:00"})
+    store.upsert_rows(rows)
+    yield store
+    store.close()
+
+
+def tokens(result):
+    return [item["token"] for item in result["items"]]
+
+
+@pytest.mark.parametrize("params", [{}, {"min_meterage": "70"}, {"q": "آپارتمان"}])
+def test_sort_key_does_not_change_result_set(store, params):
+    results = {sort: store.search({**params, "sort": sort, "page_size": "100"})
+               for sort in ("-created_at", "price_total", "-price_total", "meterage", "-floor")}
+    totals = {r["total"] for r in results.values()}
+    assert len(totals) == 1
+    assert all(sorted(tokens(r)) == sorted(tokens(results["-created_at"])) for r in results.values())
+
+
+def test_null_sort_values_come_last_in_both_directions(store):
+    asc = store.search({"sort": "price_total", "page_size": "100"})
+    desc = store.search({"sort": "-price_total", "page_size": "100"})
+    assert asc["total"] == desc["total"] == 6
+    assert [i["price_total"] for i in asc["items"]][-2:] == [None, None]
+    assert [i["price_total"] for i in desc["items"]][-2:] == [None, None]
+    assert tokens(asc)[:4] == ["t2", "t5", "t0", "t4"]
+    assert tokens(desc)[:4] == ["t0", "t4", "t5", "t2"]  # برابرها به ترتیب درج
+
+
+def test_pages_cover_every_row_once(store):
+    seen = []
+    for page in (1, 2, 3):
+        result = store.search({"sort": "-price_total", "page": str(page), "page_size": "2"})
+        assert result["total"] == 6
+        seen += tokens(result)
+    assert sorted(seen) == [f"t{i}" for i in range(6)]
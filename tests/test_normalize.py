@@ -0,0 +1,57 @@
+"""تست‌های نرمال‌سازی دسته‌ای ردیف‌ها (normalize_rows_frame)"""
+import pandas as pd
+import pytest
+
+import Divar_Scraper as ds
+
+CREATED = "2024-08-10 12:00:00"
+
+
+def normalize(**columns):
+    size = len(next(iter(columns.values())))
+    frame = pd.DataFrame({"لینک": [f"https://divar.ir/v/x/t{i}" for i in range(size)],
+                          "تاریخ ایجاد": [CREATED] * size, **columns})
+    return ds.normalize_rows_frame(frame)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("۱۴۰۳/۰۵/۱۲", "2024-08-02 00:00:00"),
+    ("1402/12/29 14:30", "2024-03-19 14:30:00"),
+    ("۱۳۹۹/۱۲/۳۰", "2021-03-20 00:00:00"),  # اسفند سال کبیسه
+    ("2024-01-05 10:00:00", "2024-01-05 10:00:00"),
+    ("۲ ساعت پیش", "2024-08-10 10:00:00"),
+    ("دیروز", "2024-08-09 12:00:00"),
+    ("لحظاتی پیش", CREATED),
+])
+def test_dates(raw, expected):
+    assert normalize(**{"تاریخ": [raw]})["تاریخ"][0] == pd.Timestamp(expected)
+
+
+def test_invalid_jalali_date_is_not_invented():
+    assert pd.isna(normalize(**{"تاریخ": ["۱۴۰۳/۱۳/۴۰"]})["تاریخ"][0])
+
+
+def test_jalali_to_gregorian():
+    assert ds.jalali_to_gregorian(1403, 1, 1) == (2024, 3, 20)
+    assert ds.jalali_to_gregorian(1403, 12, 30) == (2025, 3, 20)
+    with pytest.raises(ValueError):
+        ds.jalali_to_gregorian(1402, 7, 31)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("یک", 1), ("دو خوابه", 2), ("سه", 3), ("۴", 4), ("بدون اتاق", 0), ("یکصد", None), (None, None),
+])
+def test_room_count_words(raw, expected):
+    value = normalize(**{"تعداد اتاق": [raw]})["تعداد اتاق"][0]
+    assert (pd.isna(value) if expected is None else value == expected)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("۴ میلیارد و ۵۰۰ میلیون تومان", 4_500_000_000),
+    ("۴ تا ۵ میلیارد", 4_500_000_000),
+    ("۲,۵۰۰,۰۰۰,۰۰۰ تومان", 2_500_000_000),
+    ("توافقی", None),
+])
+def test_price_amounts(raw, expected):
+    value = normalize(**{"قیمت کل": [raw]})["قیمت کل"][0]
+    assert (pd.isna(value) if expected is None else value == expected)
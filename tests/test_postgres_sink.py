@@ -0,0 +1,114 @@
+"""
+تست‌های PostgresSink روی یک PostgreSQL محلی.
+DSN پایگاه تست در TEST_PG_DSN (مثلاً postgresql://postgres@localhost/divar_test)؛ بدون آن یا بدون psycopg2 رد می‌شوند.
+"""
+import os
+import uuid
+
+import pandas as pd
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import Divar_Scraper as ds  # noqa: E402
+
+TEST_PG_DSN = os.environ.get("TEST_PG_DSN", "")
+pytestmark = pytest.mark.skipif(not TEST_PG_DSN, reason="TEST_PG_DSN تنظیم نشده است")
+
+
+def ad(token, **fields):
+    row = {"لینک": f"https://divar.ir/v/x/{token}", "عنوان": f"آپارتمان {token}"}
+    row.update(fields)
+    return row
+
+
+def frame(*rows):
+    return ds.normalize_rows_frame(pd.DataFrame(list(rows)))
+
+
+@pytest.fixture
+def sink():
+    table = f"divar_test_{uuid.uuid4().hex[:10]}"
+    sink = ds.PostgresSink(dsn=TEST_PG_DSN, table=table, batch_rows=10_000, batch_seconds=3600)
+    yield sink
+    sink.close()
+    with psycopg2.connect(TEST_PG_DSN) as conn, conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.close()
+
+
+def fetch(sink, token, *cols):
+    with psycopg2.connect(TEST_PG_DSN) as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT {', '.join(cols)} FROM {sink.table} WHERE token = %s", (token,))
+        row = cur.fetchone()
+    conn.close()
+    return row
+
+
+def count(sink):
+    with psycopg2.connect(TEST_PG_DSN) as conn, conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {sink.table}")
+        n = cur.fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_copy_staging_upsert_keeps_latest_row_per_token(sink):
+    sink.add(frame(ad("a1", **{"قیمت کل": "1,000,000,000"}), ad("b2", **{"متراژ": "80"})))
+    sink.add(frame(ad("a1", **{"قیمت کل": "2,000,000,000"})))
+    assert sink.flush() == 3
+    assert count(sink) == 2
+    assert fetch(sink, "a1", "price_total")[0] == 2_000_000_000
+
+    # flush دوم روی همان توکن‌ها به‌روزرسانی است، نه ردیف تکراری
+    sink.add(frame(ad("b2", **{"متراژ": "95"})))
+    assert sink.flush() == 1
+    assert count(sink) == 2
+    assert fetch(sink, "b2", "meterage")[0] == 95
+
+
+def test_partial_rows_only_fill_non_empty_columns(sink):
+    sink.add(frame(ad("c3", **{"متراژ": "120", "سال ساخت": "1395", "قیمت کل": "5,000,000,000",
+                               "تاریخ ایجاد": "2024-01-01 10:00:00"})))
+    sink.flush()
+
+    sink.add(frame(ad("c3", **{"قیمت کل": "4,500,000,000", "تاریخ ایجاد": "2024-03-01 09:00:00"})), partial=True)
+    sink.add(frame(ad("d4", **{"قیمت کل": "900,000,000"})), partial=True)
+    assert sink.flush() == 2
+
+    meterage, build_year, price, created_at, row_json = fetch(
+        sink, "c3", "meterage", "build_year", "price_total", "created_at", "row_json")
+    assert (meterage, build_year, price) == (120, 1395, 4_500_000_000)
+    assert str(created_at) == "2024-01-01 10:00:00"
+    assert row_json["تاریخ ایجاد"] == "2024-01-01 10:00:00"
+    assert row_json["متراژ"] == 120
+    # کارت بدون ردیف قبلی درج می‌شود
+    assert fetch(sink, "d4", "price_total")[0] == 900_000_000
+
+
+def test_full_and_partial_rows_in_one_batch(sink):
+    sink.add(frame(ad("e5", **{"متراژ": "70", "قیمت کل": "3,000,000,000"})))
+    sink.add(frame(ad("e5", **{"قیمت کل": "2,800,000,000"})), partial=True)
+    assert sink.flush() == 2
+    assert fetch(sink, "e5", "meterage", "price_total") == (70, 2_800_000_000)
+
+
+def test_reconnects_after_connection_failure(sink):
+    sink.add(frame(ad("f6")))
+    assert sink.flush() == 1
+    backend_pid = sink.conn.get_backend_pid()
+
+    with psycopg2.connect(TEST_PG_DSN) as admin, admin.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(%s)", (backend_pid,))
+    admin.close()
+
+    sink.add(frame(ad("g7"), ad("h8")))
+    # flush روی اتصال قطع‌شده شکست می‌خورد ولی بافر حفظ می‌شود
+    assert sink.flush() == 0
+    assert len(sink.buffer) == 2
+    assert sink.conn is None
+
+    assert sink.flush() == 2
+    assert sink.conn.get_backend_pid() != backend_pid
+    assert sink.buffer == []
+    assert count(sink) == 3
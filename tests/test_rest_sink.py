@@ -0,0 +1,204 @@
+"""تست‌های RestSink با یک سرور HTTP محلی که پاسخ‌هایش از پیش تعیین می‌شود"""
+import gzip
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import Divar_Scraper as ds
+
+
+class StubEndpoint:
+    """endpoint ساختگی: پاسخ‌های script به ترتیب و بعد از آن 200؛ هر درخواست ثبت می‌شود"""
+
+    def __init__(self):
+        self.script = []  # (status, headers, delay)
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub.lock:
+                    status, headers, delay = stub.script.pop(0) if stub.script else (200, {}, 0)
+                    stub.requests.append({
+                        "time": time.time(),
+                        "status": status,
+                        "headers": dict(self.headers),
+                        "rows": json.loads(gzip.decompress(body))["rows"],
+                    })
+                time.sleep(delay)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/ingest"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def delivered(self):
+        return [r for r in self.requests if 200 <= r["status"] < 300]
+
+    def delivered_tokens(self):
+        return [row["token"] for r in self.delivered() for row in r["rows"]]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def endpoint():
+    stub = StubEndpoint()
+    yield stub
+    stub.close()
+
+
+def frame(*tokens):
+    return ds.normalize_rows_frame(pd.DataFrame(
+        [{"لینک": f"https://divar.ir/v/x/{t}", "عنوان": t, "قیمت کل": "1,000,000,000"} for t in tokens]))
+
+
+def make_sink(url, **kwargs):
+    kwargs.setdefault("batch_rows", 3)
+    kwargs.setdefault("batch_seconds", 3600)
+    kwargs.setdefault("spill_dir", "spill")
+    return ds.RestSink(endpoint=url, **kwargs)
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def spill_files(spill_dir="spill"):
+    return sorted(n for n in os.listdir(spill_dir) if n.endswith(".jsonl.gz"))
+
+
+def test_rows_are_sent_in_gzip_batches(endpoint):
+    sink = make_sink(endpoint.url)
+    sink.add(frame("a1", "a2", "a3", "a4", "a5", "a6", "a7"))
+    assert wait_for(lambda: len(endpoint.requests) == 2)
+    sink.close()
+
+    assert [len(r["rows"]) for r in endpoint.requests] == [3, 3, 1]
+    assert endpoint.delivered_tokens() == ["a1", "a2", "a3", "a4", "a5", "a6", "a7"]
+    first = endpoint.requests[0]
+    assert first["headers"]["Content-Encoding"] == "gzip"
+    assert first["headers"]["Idempotency-Key"]
+    assert all(row["idempotency_key"].startswith(f"{row['token']}:") for row in first["rows"])
+    assert sink.sent == 7
+    assert spill_files() == []
+
+
+def test_partial_rows_drop_empty_fields(endpoint):
+    sink = make_sink(endpoint.url)
+    sink.add(frame("p1"), partial=True)
+    sink.close()
+    row = endpoint.requests[0]["rows"][0]
+    assert row["partial"] is True
+    assert None not in row["row"].values()
+
+
+def test_429_waits_for_retry_after(endpoint):
+    endpoint.script = [(429, {"Retry-After": "1"}, 0)]
+    sink = make_sink(endpoint.url)
+    sink.add(frame("r1", "r2", "r3"))
+    assert wait_for(lambda: endpoint.delivered())
+    sink.close()
+
+    first, second = endpoint.requests
+    assert first["status"] == 429
+    assert second["time"] - first["time"] >= 0.9
+    assert first["rows"] == second["rows"]
+    assert endpoint.delivered_tokens() == ["r1", "r2", "r3"]
+
+
+def test_5xx_is_retried_until_delivered(endpoint):
+    endpoint.script = [(503, {}, 0), (502, {}, 0)]
+    sink = make_sink(endpoint.url)
+    sink.add(frame("s1", "s2", "s3"))
+    assert wait_for(lambda: endpoint.delivered())
+    sink.close()
+
+    assert [r["status"] for r in endpoint.requests] == [503, 502, 200]
+    assert endpoint.delivered_tokens() == ["s1", "s2", "s3"]
+
+
+def test_4xx_batch_is_set_aside_not_retried(endpoint):
+    endpoint.script = [(400, {}, 0)]
+    sink = make_sink(endpoint.url)
+    sink.add(frame("b1", "b2", "b3", "b4"))
+    sink.close()
+
+    assert [r["status"] for r in endpoint.requests] == [400, 200]
+    assert endpoint.delivered_tokens() == ["b4"]
+    assert len(os.listdir(os.path.join("spill", "rejected"))) == 1
+
+
+def test_overflow_spills_to_disk_and_replays_first(endpoint):
+    endpoint.script = [(503, {}, 0)] * 1000
+    sink = make_sink(endpoint.url, batch_rows=2, memory_rows=2)
+    sink.add(frame("o1", "o2", "o3", "o4", "o5", "o6"))
+    assert len(spill_files()) >= 2  # مازاد صف حافظه بدون انتظار برای شبکه روی دیسک رفت
+    sink.close(timeout=2)
+    assert endpoint.delivered() == []
+    assert spill_files()
+
+    endpoint.script = []
+    replay = make_sink(endpoint.url, batch_rows=2, memory_rows=2)
+    replay.add(frame("n1"))
+    assert wait_for(lambda: not spill_files())
+    replay.close()
+
+    tokens = endpoint.delivered_tokens()
+    assert sorted(set(tokens)) == ["n1", "o1", "o2", "o3", "o4", "o5", "o6"]
+    assert tokens[-1] == "n1"  # spillهای اجرای قبل اول فرستاده می‌شوند
+
+
+def test_close_keeps_inflight_batch_for_next_run(endpoint):
+    endpoint.script = [(200, {}, 3)]  # پاسخ دیرتر از timeout بستن
+    sink = make_sink(endpoint.url)
+    sink.add(frame("i1", "i2", "i3", "i4"))
+    assert wait_for(lambda: endpoint.requests)
+    sink.close(timeout=0.5)
+    assert spill_files()
+
+    replay = make_sink(endpoint.url)
+    assert wait_for(lambda: not spill_files())
+    replay.close()
+
+    # حداقل یک بار: دسته در حال ارسال ممکن است دو بار برسد ولی هیچ ردیفی گم نمی‌شود
+    assert set(endpoint.delivered_tokens()) == {"i1", "i2", "i3", "i4"}
+
+
+def test_corrupt_spill_file_is_quarantined(endpoint):
+    os.makedirs("spill")
+    with open(os.path.join("spill", "0000-bad.jsonl.gz"), "wb") as f:
+        f.write(b"not gzip")
+    with open(os.path.join("spill", "0001-trunc.jsonl.gz"), "wb") as f:
+        f.write(gzip.compress(b'{"token": "x"')[:-4])
+
+    sink = make_sink(endpoint.url)
+    sink.add(frame("c1"))
+    sink.close()
+
+    assert endpoint.delivered_tokens() == ["c1"]
+    assert spill_files() == []
+    assert sorted(os.listdir(os.path.join("spill", "corrupt"))) == ["0000-bad.jsonl.gz", "0001-trunc.jsonl.gz"]
@@ -0,0 +1,105 @@
+"""تست‌های بازدید مجدد: آگهی حذف‌شده ثبت می‌شود و شکست‌های پیاپی سقف دارند"""
+import os
+import time
+
+import pytest
+
+import Divar_Scraper as ds
+
+LINK = "https://divar.ir/v/آپارتمان/AbCd1234"
+
+
+class PageDriver:
+    """درایور ساختگی: آدرس فعلی و نتیجه PAGE_HEALTH_JS از پیش تعیین می‌شود"""
+
+    def __init__(self, status=200, title="", text="", url=LINK):
+        self.page = {"status": status, "title": title, "text": text}
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        return self.page
+
+
+@pytest.fixture
+def history(monkeypatch):
+    monkeypatch.setattr(ds, "human_sleep", lambda *a: None)
+    history = ds.AdHistoryStore("history.sqlite")
+    history.observe_rows([{"لینک": LINK, "عنوان": "آپارتمان ۹۰ متری", "قیمت کل": "3,000,000,000",
+                           "متراژ": "90", "وضعیت": ds.AD_STATUS_ACTIVE}])
+    history.conn.execute("UPDATE ad_state SET next_check = 0")
+    history.conn.commit()
+    yield history
+    history.close()
+
+
+def failing_scrape(monkeypatch):
+    monkeypatch.setattr(ds, "scrape_ad_detail", lambda driver, link, category: None)
+
+
+def status_changes(history):
+    return [v for _, field, v in history.history(ds.ad_token_from_link(LINK)) if field == "وضعیت"]
+
+
+@pytest.mark.parametrize("driver", [
+    PageDriver(status=404),
+    PageDriver(status=410),
+    PageDriver(url="https://divar.ir/s/shiraz/buy-apartment"),
+    PageDriver(text="این آگهی حذف شده است"),
+    PageDriver(title="دیوار", text="آگهی منقضی شده"),
+])
+def test_removed_ad_is_recorded_when_scrape_fails(history, monkeypatch, driver):
+    failing_scrape(monkeypatch)
+    ds.revisit_known_ads(driver, history)
+    assert status_changes(history)[-1] == ds.AD_STATUS_REMOVED
+    assert history.conn.execute("SELECT failures FROM ad_state").fetchone()[0] == 0
+
+    # ردیف خالی آگهی حذف‌شده روی جزئیات قبلی اکسل نوشته نمی‌شود
+    assert not os.path.exists(ds.OUTPUT_XLSX)
+
+
+def test_failures_without_removal_signs_are_capped(history, monkeypatch):
+    failing_scrape(monkeypatch)
+    driver = PageDriver(status=200, title="دیوار", text="x" * 5000)
+    for attempt in range(1, ds.REVISIT_MAX_POSTPONES):
+        ds.revisit_known_ads(driver, history)
+        failures, next_check = history.conn.execute("SELECT failures, next_check FROM ad_state").fetchone()
+        assert failures == attempt
+        assert next_check == pytest.approx(time.time() + ds.REVISIT_RETRY_SECONDS, abs=5)
+        history.conn.execute("UPDATE ad_state SET next_check = 0")
+        history.conn.commit()
+
+    ds.revisit_known_ads(driver, history)
+    failures, next_check = history.conn.execute("SELECT failures, next_check FROM ad_state").fetchone()
+    assert failures == 0
+    assert next_check == pytest.approx(time.time() + ds.REVISIT_MAX_INTERVAL_HOURS * 3600, abs=5)
+    assert status_changes(history) == [ds.AD_STATUS_ACTIVE]
+
+
+def test_successful_revisit_resets_failures(history, monkeypatch):
+    failing_scrape(monkeypatch)
+    ds.revisit_known_ads(PageDriver(), history)
+    assert history.conn.execute("SELECT failures FROM ad_state").fetchone()[0] == 1
+
+    history.conn.execute("UPDATE ad_state SET next_check = 0")
+    history.conn.commit()
+    monkeypatch.setattr(ds, "scrape_ad_detail", lambda driver, link, category: {
+        "لینک": link, "عنوان": "آپارتمان ۹۰ متری", "قیمت کل": "2,900,000,000", "متراژ": "90"})
+    ds.revisit_known_ads(PageDriver(), history)
+    assert history.conn.execute("SELECT failures FROM ad_state").fetchone()[0] == 0
+
+
+def test_old_history_file_gets_failures_column():
+    import sqlite3
+    conn = sqlite3.connect("old.sqlite")
+    conn.execute("""CREATE TABLE ad_state (token TEXT PRIMARY KEY, link TEXT NOT NULL, content_hash TEXT,
+                    last_values TEXT, first_seen INTEGER NOT NULL, last_checked INTEGER,
+                    next_check INTEGER NOT NULL, interval INTEGER NOT NULL)""")
+    conn.execute("INSERT INTO ad_state VALUES ('AbCd1234', ?, NULL, NULL, 0, NULL, 0, 86400)", (LINK,))
+    conn.commit()
+    conn.close()
+
+    history = ds.AdHistoryStore("old.sqlite")
+    try:
+        assert history.postpone(LINK) == 1
+    finally:
+        history.close()
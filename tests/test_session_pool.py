@@ -0,0 +1,205 @@
+"""تست‌های استخر نشست: توزیع بار، بودجه نرخ، کنار گذاشتن نشست ناسالم و گزارش سلامت صفحه درایور"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import Divar_Scraper as ds
+
+
+class FakeDriver:
+    """درایور ساختگی: نتیجه PAGE_HEALTH_JS از پیش تعیین می‌شود"""
+
+    def __init__(self, page=None):
+        self.page = page or {"status": 200, "title": "دیوار", "text": "x" * 5000}
+        self.visited = []
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def execute_script(self, script, *args):
+        return self.page
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ds.SessionPool([ds.EgressSession("a"), ds.EgressSession("b")])
+    monkeypatch.setattr(ds, "_SESSION_POOL", pool)
+    return pool
+
+
+def test_pick_prefers_least_loaded_session(pool):
+    a, b = pool.sessions
+    with pool.lease("https://divar.ir/v/1") as first:
+        with pool.lease("https://divar.ir/v/2") as second:
+            assert {first.name, second.name} == {"a", "b"}
+    assert a.leases == b.leases == 0
+
+    driver = FakeDriver()
+    pool.attach(driver, a)
+    assert pool.pick() is b
+    assert ds.driver_session(driver) is a
+
+    # بار برابر: نشستی که درخواست کمتری داشته
+    pool.report(b, True)
+    del driver
+    assert pool.pick() is a
+
+
+def test_leases_spread_across_sessions_under_concurrency(pool):
+    used = []
+    barrier = threading.Barrier(4)
+
+    def worker():
+        with pool.lease("https://divar.ir/v/x") as session:
+            used.append(session.name)
+            barrier.wait(timeout=5)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(used) == ["a", "a", "b", "b"]
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = ds.TokenBucket(per_minute=60, burst=2)
+    now = bucket.stamp
+    assert bucket.wait_time(now) == 0
+    bucket.take()
+    assert bucket.wait_time(now) == 0
+    bucket.take()
+    assert bucket.wait_time(now) == pytest.approx(1.0)
+    assert bucket.wait_time(now + 0.5) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 1.0) == 0
+
+
+def test_pace_is_per_session_and_per_host():
+    session = ds.EgressSession("paced", rate_per_minute=120, endpoint_rates={"api.divar.ir": 0})
+    pool = ds.SessionPool([session])
+    started = time.monotonic()
+    for _ in range(ds.SESSION_BURST + 1):
+        pool.pace(session, "https://divar.ir/v/x")
+    assert time.monotonic() - started >= 0.4  # 120 در دقیقه: بعد از burst هر درخواست 0.5 ثانیه
+
+    # host دیگر بودجه جدا دارد و نرخ 0 یعنی بدون سقف
+    started = time.monotonic()
+    for _ in range(10):
+        pool.pace(session, "https://api.divar.ir/v8/posts")
+    pool.pace(session, "https://s100.divar.ir/img.jpg")
+    assert time.monotonic() - started < 0.2
+
+
+def test_unhealthy_session_is_benched_until_cooldown(pool, monkeypatch):
+    monkeypatch.setattr(ds, "SESSION_COOLDOWN", 60)
+    a, b = pool.sessions
+    for _ in range(ds.SESSION_MIN_SAMPLES):
+        pool.report(a, False, "HTTP 429")
+    assert not a.available()
+    assert a.failures == ds.SESSION_MIN_SAMPLES
+    assert all(pool.pick() is b for _ in range(3))
+
+    # همه در استراحت: نشستی که زودتر برمی‌گردد
+    for _ in range(ds.SESSION_MIN_SAMPLES):
+        pool.report(b, False, "HTTP 429")
+    assert pool.pick() is a
+
+    a.cooldown_until = 0.0
+    assert a.available()
+    assert ds.SESSION_MIN_HEALTH < a.health < 1.0  # با امتیاز آزمایشی برمی‌گردد
+
+
+def test_single_session_is_never_benched():
+    only = ds.EgressSession("only")
+    pool = ds.SessionPool([only])
+    for _ in range(ds.SESSION_MIN_SAMPLES * 2):
+        pool.report(only, False)
+    assert only.available()
+    assert pool.pick() is only
+
+
+@pytest.mark.parametrize("page, reason", [
+    ({"status": 200, "title": "آپارتمان ۱۲۰ متری", "text": "x" * 5000}, None),
+    ({"status": 404, "title": "صفحه پیدا نشد", "text": "آگهی حذف شده"}, None),
+    ({"status": 429, "title": "", "text": ""}, "HTTP 429"),
+    ({"status": 503, "title": "", "text": ""}, "HTTP 503"),
+    ({"status": 200, "title": "Just a moment...", "text": "checking your browser"}, "block page (just a moment)"),
+    ({"status": 200, "title": "دیوار", "text": "لطفا captcha را حل کنید"}, "block page (captcha)"),
+    ({"status": 0, "title": "دیوار", "text": "captcha " + "x" * 5000}, None),  # متن بلند = صفحه عادی
+])
+def test_block_page_reason(page, reason):
+    assert ds.block_page_reason(page["status"], page["title"], page["text"]) == reason
+
+
+def test_blocked_driver_page_counts_against_session(pool, monkeypatch):
+    monkeypatch.setattr(ds, "wait_for_internet", lambda *a, **k: True)
+    a, b = pool.sessions
+    driver = FakeDriver({"status": 429, "title": "429 Too Many Requests", "text": "Too Many Requests"})
+    pool.attach(driver, a)
+
+    ds._open_ad_page(driver, "https://divar.ir/v/x/abc", False, ds.AdBudget())
+    assert driver.visited == ["https://divar.ir/v/x/abc"]
+    assert (a.requests, a.failures) == (1, 1)
+
+    driver.page = {"status": 200, "title": "آپارتمان", "text": "x" * 5000}
+    ds._open_ad_page(driver, "https://divar.ir/v/x/def", False, ds.AdBudget())
+    assert (a.requests, a.failures) == (2, 1)
+    assert b.requests == 0
+
+
+class StandInProxy:
+    """پراکسی HTTP ساختگی: درخواست‌های absolute-URI را ثبت و با کوکی نشست پاسخ می‌دهد"""
+
+    def __init__(self, name):
+        self.requests = []
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy.requests.append({"url": self.path, "ua": self.headers.get("User-Agent"),
+                                       "cookie": self.headers.get("Cookie")})
+                body = b"<html><title>ok</title></html>"
+                self.send_response(200)
+                self.send_header("Set-Cookie", f"sid={name}; Path=/")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_sessions_use_their_own_proxy_agent_and_cookies():
+    proxies = [StandInProxy("p1"), StandInProxy("p2")]
+    try:
+        sessions = [ds.EgressSession(f"s{i}", proxy=p.url, user_agent=f"agent-{i}") for i, p in enumerate(proxies)]
+        pool = ds.SessionPool(sessions)
+        for _ in range(4):
+            with pool.lease("http://divar.test/v/x") as session:
+                with session.opener().open("http://divar.test/v/x", timeout=5) as response:
+                    response.read()
+                pool.report(session, True)
+
+        for i, proxy in enumerate(proxies):
+            assert len(proxy.requests) == 2
+            assert all(r["url"] == "http://divar.test/v/x" for r in proxy.requests)
+            assert all(r["ua"] == f"agent-{i}" for r in proxy.requests)
+            # کوکی هر نشست فقط به پراکسی خودش برمی‌گردد
+            assert proxy.requests[0]["cookie"] is None
+            assert proxy.requests[1]["cookie"] == f"sid=p{i + 1}"
+    finally:
+        for proxy in proxies:
+            proxy.close()
@@ -0,0 +1,124 @@
+"""تست‌های صف کار مشترک؛ همه موارد روی هر دو backend (SQLite و Redis ساختگی با fakeredis) اجرا می‌شوند"""
+import pytest
+
+import Divar_Scraper as ds
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def work_queue(request, monkeypatch):
+    if request.param == "sqlite":
+        queue = ds.open_work_queue("sqlite:///queue.sqlite")
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = pytest.importorskip("redis")
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(redis.Redis, "from_url",
+                            classmethod(lambda cls, url, **kw: fakeredis.FakeRedis(server=server, **kw)))
+        queue = ds.open_work_queue("redis://localhost:6379/0")
+        assert isinstance(queue, ds.RedisWorkQueue)
+    yield queue
+    queue.close()
+
+
+def link(token, slug="آپارتمان"):
+    return f"https://divar.ir/v/{slug}/{token}"
+
+
+def counts(queue, *states):
+    stats = queue.stats()
+    return tuple(stats.get(state, 0) for state in states)
+
+
+def test_enqueue_dedupes_by_token(work_queue):
+    assert work_queue.enqueue([link("aaa"), link("bbb"), link("aaa")]) == 2
+    # همان توکن با slug دیگر هم تکراری است
+    assert work_queue.enqueue([link("bbb", "دیگر"), link("ccc")]) == 1
+    assert work_queue.enqueue([]) == 0
+    assert counts(work_queue, "ready") == (3,)
+
+
+def test_lease_is_fifo_and_hides_item(work_queue):
+    work_queue.enqueue([link("aaa"), link("bbb")])
+    first = work_queue.lease(60)
+    second = work_queue.lease(60)
+    assert (first["item"], first["attempts"]) == (link("aaa"), 1)
+    assert second["item"] == link("bbb")
+    assert work_queue.lease(60) is None
+    assert counts(work_queue, "ready", "leased") == (0, 2)
+
+
+def test_ack_completes_item(work_queue):
+    work_queue.enqueue([link("aaa")])
+    lease = work_queue.lease(60)
+    assert work_queue.ack(lease)
+    assert not work_queue.ack(lease)
+    assert counts(work_queue, "ready", "leased", "delayed", "failed") == (0, 0, 0, 0)
+    # تأییدشده دوباره وارد صف نمی‌شود
+    assert work_queue.enqueue([link("aaa")]) == 0
+    assert work_queue.lease(60) is None
+
+
+def test_expired_lease_is_redelivered(work_queue):
+    work_queue.enqueue([link("aaa")])
+    stale = work_queue.lease(0)
+    fresh = work_queue.lease(60)
+    assert fresh["item"] == link("aaa")
+    assert fresh["attempts"] == 2
+    assert fresh["lease_id"] != stale["lease_id"]
+    # کارگر قبلی دیگر مالک آیتم نیست
+    assert not work_queue.ack(stale)
+    assert work_queue.ack(fresh)
+
+
+def test_nack_delays_item_and_reports_it_separately(work_queue):
+    work_queue.enqueue([link("aaa"), link("bbb")])
+    lease = work_queue.lease(60)
+    work_queue.nack(lease, delay=3600)
+    assert counts(work_queue, "ready", "leased", "delayed") == (1, 0, 1)
+    assert work_queue.lease(60)["item"] == link("bbb")
+    assert work_queue.lease(60) is None
+
+
+def test_nack_without_delay_retries_with_attempt_count(work_queue):
+    work_queue.enqueue([link("aaa")])
+    work_queue.nack(work_queue.lease(60), delay=0)
+    retry = work_queue.lease(60)
+    assert (retry["item"], retry["attempts"]) == (link("aaa"), 2)
+
+
+def test_nack_after_max_attempts_sends_item_to_failed(work_queue, monkeypatch):
+    monkeypatch.setattr(ds, "QUEUE_MAX_ATTEMPTS", 2)
+    work_queue.enqueue([link("aaa"), link("bbb")])
+
+    # مسیر nack
+    work_queue.nack(work_queue.lease(60), delay=0)
+    work_queue.lease(60)  # bbb
+    second = work_queue.lease(60)
+    assert (second["item"], second["attempts"]) == (link("aaa"), 2)
+    work_queue.nack(second, delay=0)
+
+    assert work_queue.lease(60) is None  # bbb هنوز lease معتبر دارد و aaa دیگر برنمی‌گردد
+    assert counts(work_queue, "leased", "failed") == (1, 1)
+
+
+def test_expired_leases_stop_after_max_attempts(work_queue, monkeypatch):
+    monkeypatch.setattr(ds, "QUEUE_MAX_ATTEMPTS", 2)
+    work_queue.enqueue([link("aaa")])
+    assert work_queue.lease(0)["attempts"] == 1
+    assert work_queue.lease(0)["attempts"] == 2
+    assert work_queue.lease(60) is None
+    assert counts(work_queue, "ready", "leased", "failed") == (0, 0, 1)
+
+
+def test_requeue_failed_resets_attempts(work_queue, monkeypatch):
+    monkeypatch.setattr(ds, "QUEUE_MAX_ATTEMPTS", 1)
+    work_queue.enqueue([link("aaa"), link("bbb")])
+    work_queue.nack(work_queue.lease(60), delay=0)
+    work_queue.nack(work_queue.lease(60), delay=0)
+    assert counts(work_queue, "failed") == (2,)
+
+    assert work_queue.requeue_failed() == 2
+    assert work_queue.requeue_failed() == 0
+    assert counts(work_queue, "ready", "failed") == (2, 0)
+    lease = work_queue.lease(60)
+    assert (lease["item"], lease["attempts"]) == (link("aaa"), 1)